@@ -1,10 +1,19 @@
+import json
+import os
 import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from decimal import Decimal
+import pandas as pd
 from pyrfc import Connection
-from decouple import config
+from decouple import config, Csv
+from django.db import connections as db_connections
 import requests
 import bmw_supplyon
+import bmw_warehouse
 
 def clean_numeric_value(value):
     """Cleans and converts numeric data."""
@@ -17,175 +26,513 @@ def clean_numeric_value(value):
     except ValueError:
         return 0
 
-def portal_bapi():
-    try:
-        # Load configuration
-        api_url = config("API_URL")
-        bapi_name = config("BAPI")
-        sold_from = config("CUS_CODE-SOLD_FROM")
-        from_date = config("INV_DT-FROM_DATE")
-
-        # Get access token
-        response = requests.post(api_url, json={"apitype": "accesstoken"}, timeout=10)
+EMPTY_PULLOUT = {"bal_pull": 0, "git_qty": 0, "next_git_qty": 0, "eta_date": None}
+
+PULLOUT_QTY_COLUMNS = ["BAL_PULLQTY", "PULL_QTY", "FKIMG", "P_QTY"]
+PULLOUT_DATE_COLUMNS = ["SDATE", "ETA_DESTI"]
+
+def clean_numeric_column(values):
+    """Vectorized `clean_numeric_value` for a whole column.
+
+    Numbers are kept, anything else is stripped to digits, '.' and '-' before
+    parsing, so 'inf' or '1e3' clean the same way as in the scalar version.
+    Missing values (None/NaN) count as 0.
+    """
+    values = pd.Series(values, dtype=object)
+    is_number = values.map(lambda value: isinstance(value, (int, float, Decimal)))
+    text = values.where(~is_number, "").astype(str).str.replace(r"[^0-9.-]", "", regex=True)
+    cleaned = pd.to_numeric(text, errors="coerce")
+    cleaned[is_number] = values[is_number].astype(float)
+    return cleaned.fillna(0).astype(float)
+
+def normalize_pullout(df_pullout):
+    """Turns the raw PULLOUT list of dicts into a typed columnar table in one pass.
+
+    Quantities become float columns and SDATE/ETA_DESTI datetime64 columns
+    (unparsable dates are NaT), so lookups never clean or parse values again.
+    """
+    table = pd.DataFrame.from_records(df_pullout)
+    table = table.reindex(columns=["KDMAT", "RECEP_FLG"] + PULLOUT_QTY_COLUMNS + PULLOUT_DATE_COLUMNS)
+    for column in PULLOUT_QTY_COLUMNS:
+        table[column] = clean_numeric_column(table[column])
+    for column in PULLOUT_DATE_COLUMNS:
+        table[column] = pd.to_datetime(table[column], format="%Y-%m-%d", errors="coerce")
+    return table
+
+def build_pullout_index(pullout_table, next_month_date):
+    """Indexes a normalized pullout table by KDMAT.
+
+    Each article keeps the values the row loop used to find by scanning:
+    BAL_PULLQTY of its first line, PULL_QTY of its first open line with no
+    FKIMG, P_QTY of its first line shipping next month and its first ETA_DESTI.
+    """
+    first = pullout_table.drop_duplicates("KDMAT").set_index("KDMAT")
+    open_lines = pullout_table[(pullout_table["RECEP_FLG"] != "X") & (pullout_table["FKIMG"] == 0)]
+    git_qty = open_lines.drop_duplicates("KDMAT").set_index("KDMAT")["PULL_QTY"].to_dict()
+    sdate = pullout_table["SDATE"]
+    next_month_lines = pullout_table[(sdate.dt.year == next_month_date.year) & (sdate.dt.month == next_month_date.month)]
+    next_git_qty = next_month_lines.drop_duplicates("KDMAT").set_index("KDMAT")["P_QTY"].to_dict()
+
+    index = {}
+    for article_no, bal_pull, eta_desti in zip(first.index, first["BAL_PULLQTY"], first["ETA_DESTI"]):
+        index[article_no] = {
+            "bal_pull": float(bal_pull),
+            "git_qty": float(git_qty.get(article_no, 0)),
+            "next_git_qty": float(next_git_qty.get(article_no, 0)),
+            "eta_date": eta_desti.date() if pd.notna(eta_desti) else None,
+        }
+    return index
+
+def warehouse_stock_map(article_nos):
+    """Loads `warehouse_qty` for all given articles in one query.
+
+    Keeps the first row returned per article, as the per-article lookup did.
+    Articles without a warehouse row are absent and should be read as 0.
+    """
+    stock = {}
+    rows = bmw_warehouse.objects.filter(buyer_article_no__in=list(article_nos)).values_list(
+        "buyer_article_no", "warehouse_qty")
+    for article_no, warehouse_qty in rows:
+        if article_no not in stock:
+            stock[article_no] = clean_numeric_value(warehouse_qty)
+    return stock
+
+UPDATE_FIELDS = [
+    "warehouse_stock", "blg_warehouse_stock", "git_qty", "next_git_wh_qty", "next_git_wh_date",
+    "safety_stock_alarm", "short_fall_demand_qty", "tot_demand_qty_raise", "demand_dt_prod",
+    "dem_sea", "dem_air", "mat_pos"
+]
+
+def write_back(results, year, week_no, buyer_id="BMW", batch_size=500):
+    """Writes computed fields back with one SELECT and chunked bulk_update calls.
+
+    `results` maps a bmw_supplyon pk to its field values. Returns the number of
+    records written; ids outside the given partition are reported and skipped.
+    """
+    records = bmw_supplyon.objects.filter(
+        buyer_id=buyer_id, year=year, created_at_week_no=week_no
+    ).in_bulk(list(results))
+    update_records = []
+    for pk, fields in results.items():
+        record = records.get(pk)
+        if record is None:
+            print(f"Error updating record {pk}: not found for {buyer_id} year {year}, week {week_no}")
+            continue
+        for field, value in fields.items():
+            setattr(record, field, value)
+        update_records.append(record)
+
+    if update_records:
+        bmw_supplyon.objects.bulk_update(update_records, UPDATE_FIELDS, batch_size=batch_size)
+    return len(update_records)
+
+class SapSession:
+    """Caches the portal token and login response and pools RFC connections.
+
+    The token and login are fetched over one pooled `requests.Session` and reused
+    until they expire. RFC connections opened from the login response are kept
+    in a small pool that repeated or concurrent BAPI calls check out through
+    `connection()`. `http` and `connection_factory` can be swapped for fakes.
+    """
+
+    def __init__(self, api_url, http=None, connection_factory=Connection,
+                 token_ttl=3000, login_ttl=3000, pool_size=4, timeout=10):
+        self.api_url = api_url
+        self.http = http or requests.Session()
+        self.connection_factory = connection_factory
+        self.token_ttl = token_ttl
+        self.login_ttl = login_ttl
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._token = None
+        self._token_expires = 0
+        self._login = None
+        self._login_expires = 0
+        self._idle = []
+        self._conn_params = None
+
+    def _post(self, payload, headers=None):
+        response = self.http.post(self.api_url, json=payload, headers=headers, timeout=self.timeout)
         response.raise_for_status()
-        token = response.json().get("token")
-        if not token:
-            raise ValueError("Token not found in the response")
-
-        headers = {"Authorization": f"Bearer {token}"}
-
-        # Authenticate
-        auth_json = {"apitype": "login", "client": "RPS"}
-        auth_response = requests.post(api_url, json=auth_json, headers=headers, timeout=10)
-        auth_response.raise_for_status()
-        auth_status = auth_response.json()
-
-        # BAPI Connection
-        conn_params = {
+        return response.json()
+
+    def token(self):
+        """Returns a valid bearer token, fetching a new one only once it expired."""
+        with self._lock:
+            if self._token and time.monotonic() < self._token_expires:
+                return self._token
+            body = self._post({"apitype": "accesstoken"})
+            token = body.get("token")
+            if not token:
+                raise ValueError("Token not found in the response")
+            self._token = token
+            self._token_expires = time.monotonic() + int(body.get("expires_in") or self.token_ttl)
+            self._login = None
+            return token
+
+    def login(self):
+        """Returns the cached login response holding the RFC logon data."""
+        token = self.token()
+        with self._lock:
+            if self._login and time.monotonic() < self._login_expires:
+                return self._login
+            headers = {"Authorization": f"Bearer {token}"}
+            self._login = self._post({"apitype": "login", "client": "RPS"}, headers=headers)
+            self._login_expires = time.monotonic() + self.login_ttl
+            return self._login
+
+    def conn_params(self):
+        auth_status = self.login()
+        return {
             "ashost": auth_status.get("ip"),
             "sysno": auth_status.get("sysnr"),
             "client": auth_status.get("client"),
             "user": auth_status.get("user_name"),
             "passwd": auth_status.get("password"),
         }
-        conn_result = Connection(**conn_params)
 
-        to_date = datetime.now().strftime("%Y%m%d")
-        parameters = {"INV_DT": {"FROM_DATE": from_date, "TO_DATE": to_date}, "CUS_CODE": {"SOLD_FROM": sold_from}}
+    @contextmanager
+    def connection(self):
+        """Checks out a live RFC connection and returns it to the pool afterwards.
+
+        A connection whose call raised is closed instead of being reused.
+        """
+        conn_params = self.conn_params()
+        conn = None
+        with self._lock:
+            if conn_params != self._conn_params:
+                # Logon data changed: connections opened with the old one are stale
+                stale, self._idle = self._idle, []
+                self._conn_params = conn_params
+            else:
+                stale = []
+            while self._idle and conn is None:
+                candidate = self._idle.pop()
+                if getattr(candidate, "alive", True):
+                    conn = candidate
+                else:
+                    stale.append(candidate)
+        for old in stale:
+            _close_quietly(old)
+
+        if conn is None:
+            conn = self.connection_factory(**conn_params)
+        try:
+            yield conn
+        except Exception:
+            _close_quietly(conn)
+            raise
+        with self._lock:
+            if conn_params == self._conn_params and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                conn = None
+        if conn is not None:
+            _close_quietly(conn)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            _close_quietly(conn)
+        self.http.close()
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except Exception as e:
+        print(f"Error closing RFC connection: {e}")
+
+_sap_sessions = {}
+_sap_sessions_lock = threading.Lock()
+
+def get_sap_session(api_url):
+    """Returns the process-wide SapSession for `api_url`."""
+    with _sap_sessions_lock:
+        session = _sap_sessions.get(api_url)
+        if session is None:
+            session = _sap_sessions[api_url] = SapSession(
+                api_url,
+                token_ttl=config("TOKEN_TTL", default=3000, cast=int),
+                login_ttl=config("LOGIN_TTL", default=3000, cast=int),
+                pool_size=config("RFC_POOL_SIZE", default=4, cast=int),
+            )
+        return session
+
+PULLOUT_STORE = config("PULLOUT_STORE", default="pullout_store.json")
+PULLOUT_KEY = config("PULLOUT_KEY", default="VBELN,POSNR,KDMAT", cast=Csv())
+
+def pullout_key(item):
+    """Identifies a pullout line by its PULLOUT_KEY fields.
+
+    Raises ValueError when a key field is missing: an empty part would make
+    different lines share a key and silently overwrite each other.
+    """
+    missing = [field for field in PULLOUT_KEY if item.get(field) is None]
+    if missing:
+        raise ValueError(f"Pullout line lacks key field(s) {', '.join(missing)}; set PULLOUT_KEY "
+                         f"to fields the PULLOUT table returns (got {', '.join(sorted(item))})")
+    return "|".join(str(item[field]).strip() for field in PULLOUT_KEY)
+
+def read_pullout_store(path=PULLOUT_STORE):
+    """Returns the stored watermark, pullout lines keyed by `pullout_key` and
+    per line the latest FROM_DATE of a window that returned it."""
+    if not os.path.exists(path):
+        return None, {}, {}
+    with open(path, encoding="utf-8") as f:
+        store = json.load(f)
+    return store.get("watermark"), store.get("lines", {}), store.get("pulled_from", {})
+
+def write_pullout_store(watermark, lines, pulled_from, path=PULLOUT_STORE):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        # RFC values such as Decimal or date are stored as strings
+        json.dump({"watermark": watermark, "lines": lines, "pulled_from": pulled_from}, f, default=str)
+    os.replace(tmp_path, path)
+
+def fetch_pullout(session, bapi_name, sold_from, from_date, to_date):
+    parameters = {"INV_DT": {"FROM_DATE": from_date, "TO_DATE": to_date}, "CUS_CODE": {"SOLD_FROM": sold_from}}
+    with session.connection() as conn_result:
         result = conn_result.call(bapi_name, **parameters)
+    return result.get("PULLOUT", [])
+
+PARTITION_WORKERS = config("PARTITION_WORKERS", default=4, cast=int)
+BAPI_SLICE_MONTHS = config("BAPI_SLICE_MONTHS", default=1, cast=int)
+BAPI_WORKERS = config("BAPI_WORKERS", default=4, cast=int)
+BAPI_RETRIES = config("BAPI_RETRIES", default=3, cast=int)
+
+def date_slices(from_date, to_date, months=1):
+    """Splits an inclusive YYYYMMDD range into consecutive slices of `months` months."""
+    start = datetime.strptime(from_date, "%Y%m%d")
+    end = datetime.strptime(to_date, "%Y%m%d")
+    if months <= 0:
+        return [(from_date, to_date)]
+    slices = []
+    while start <= end:
+        month_index = start.year * 12 + start.month - 1 + months
+        next_start = datetime(month_index // 12, month_index % 12 + 1, 1)
+        slice_end = min(next_start - timedelta(days=1), end)
+        slices.append((start.strftime("%Y%m%d"), slice_end.strftime("%Y%m%d")))
+        start = next_start
+    return slices
+
+def fetch_pullout_slice(session, bapi_name, sold_from, from_date, to_date, retries=BAPI_RETRIES):
+    """Fetches one slice, retrying it on its own with a growing back-off."""
+    for attempt in range(1, retries + 1):
+        try:
+            return fetch_pullout(session, bapi_name, sold_from, from_date, to_date)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            print(f"Slice {from_date}-{to_date} failed (attempt {attempt}/{retries}): {e}")
+            time.sleep(2 ** attempt)
+
+def fetch_pullout_sliced(session, bapi_name, sold_from, slices, workers=BAPI_WORKERS):
+    """Fetches date slices concurrently over pooled RFC connections.
+
+    Returns `{pullout_key: (slice FROM_DATE, line)}`. Slices are merged in
+    date order, the later slice winning for lines reported in both.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(fetch_pullout_slice, session, bapi_name, sold_from, from_date, to_date)
+            for from_date, to_date in slices
+        ]
+        results = [future.result() for future in futures]
+
+    merged = {}
+    for (from_date, _), pullout in zip(slices, results):
+        for item in pullout:
+            merged[pullout_key(item)] = (from_date, item)
+    return merged
+
+# Open lines older than this keep their last pulled values until a full_resync; 0 reaches back to all of them
+PULLOUT_LOOKBACK_DAYS = config("PULLOUT_LOOKBACK_DAYS", default=31, cast=int)
+
+def refresh_from_date(watermark, lines, pulled_from, lookback_days=PULLOUT_LOOKBACK_DAYS):
+    """FROM_DATE of the next delta window: the oldest window of an open line, capped by `lookback_days`."""
+    from_date = watermark
+    for key, item in lines.items():
+        if item.get("RECEP_FLG") != "X":
+            from_date = min(from_date, pulled_from.get(key) or config("INV_DT-FROM_DATE"))
+    if lookback_days > 0:
+        earliest = (datetime.now() - timedelta(days=lookback_days)).strftime("%Y%m%d")
+        from_date = max(from_date, min(earliest, watermark))
+    return from_date
+
+def load_pullout(session, bapi_name, sold_from, full_resync=False, path=PULLOUT_STORE,
+                 slice_months=BAPI_SLICE_MONTHS, workers=BAPI_WORKERS, lookback_days=PULLOUT_LOOKBACK_DAYS):
+    """Full pullout history, upserting by `pullout_key` the delta since the stored watermark.
+
+    `full_resync` drops the store and pulls again from INV_DT-FROM_DATE.
+    """
+    watermark, lines, pulled_from = (None, {}, {}) if full_resync else read_pullout_store(path)
+    if watermark:
+        from_date = refresh_from_date(watermark, lines, pulled_from, lookback_days)
+    else:
+        from_date = config("INV_DT-FROM_DATE")
+    to_date = datetime.now().strftime("%Y%m%d")
+
+    slices = date_slices(from_date, to_date, slice_months)
+    if len(slices) > 1:
+        delta = fetch_pullout_sliced(session, bapi_name, sold_from, slices, workers=workers)
+    else:
+        delta = {pullout_key(item): (from_date, item)
+                 for item in fetch_pullout(session, bapi_name, sold_from, from_date, to_date)}
+    for key, (window_from, item) in delta.items():
+        lines[key] = item
+        # A line's invoice date does not move: the latest window start that returned it is the tightest
+        pulled_from[key] = max(pulled_from.get(key, window_from), window_from)
+    write_pullout_store(to_date, lines, pulled_from, path)
+    print(f"Pulled {len(delta)} pullout lines for {from_date}-{to_date}, {len(lines)} stored")
+    return list(lines.values())
+
+_partition_pullout_index = None
+
+def _init_partition_worker(pullout_index):
+    """Receives the shared pullout index once per worker process."""
+    global _partition_pullout_index
+    _partition_pullout_index = pullout_index
+
+def process_partition(year, week_no, buyer_id="BMW", pullout_index=None, batch_size=500):
+    """Computes and writes back one (year, week, buyer) SupplyOn partition.
+
+    Returns the partition's row and update counts and its wall time.
+    """
+    start = time.perf_counter()
+    pullout_index = pullout_index if pullout_index is not None else _partition_pullout_index
+    supplyon_data = list(bmw_supplyon.objects.filter(
+        buyer_id=buyer_id, year=year, created_at_week_no=week_no
+    ).values("id", "buyer_article_no", "order_no", "delivery_quantity", "creation_date", "delivery_date"))
+
+    # First `delivery_date` per article, used to gate the next-month GIT lookup
+    first_delivery_dates = {}
+    for row in supplyon_data:
+        first_delivery_dates.setdefault(row["buyer_article_no"], row["delivery_date"])
+
+    # Warehouse stock for every article of the week, in one query
+    warehouse_stock = warehouse_stock_map(first_delivery_dates)
+
+    results = {}
+    for row in supplyon_data:
+        article_no = row["buyer_article_no"]
+        pullout = pullout_index.get(article_no, EMPTY_PULLOUT)
+
+        bal_pull = pullout["bal_pull"]
+        git_qty_l = pullout["git_qty"]
+
+        # Find `next_git_qty` for the next month
+        next_git_qty = 0
+        delivery_date_str = first_delivery_dates.get(article_no)
+        if delivery_date_str:
+            try:
+                datetime.strptime(delivery_date_str, "%Y-%m-%d")
+                next_git_qty = pullout["next_git_qty"]
+            except ValueError as e:
+                print(f"Error parsing delivery_date: {e}")
+
+        warehouse_stock_j = warehouse_stock.get(article_no, 0)
+
+        # Compute required quantities
+        safety_stock_alm_o = int(warehouse_stock_j) - int(bal_pull) + int(git_qty_l)
+        short_fall_dem_qty_p = int(clean_numeric_value(row.get("delivery_quantity", 0))) - int(bal_pull)
+        tot_dem_qty_raise_q = safety_stock_alm_o + short_fall_dem_qty_p
+
+        # Convert Message Date
+        creation_date = row.get("creation_date", "").strip()
+        creation_date = datetime.strptime(creation_date, "%Y-%m-%d") if creation_date else None
+
+        if creation_date:
+            dem_dt_prod_r = creation_date - timedelta(days=100)
+            dem_sea_s = creation_date - timedelta(days=70)
+            dem_air_t = creation_date - timedelta(days=25)
+        else:
+            dem_dt_prod_r = dem_sea_s = dem_air_t = None
+
+        # Material Position Calculation
+        if bal_pull != 0 and git_qty_l == 0 and next_git_qty == 0:
+            mat_pos_u = "Sufficient stock available in warehouse against call-off"
+        elif bal_pull == 0 and git_qty_l != 0 and next_git_qty != 0:
+            mat_pos_u = "Alert on GIT material - Not reported on time against call-off"
+        elif bal_pull == 0 and git_qty_l == 0 and next_git_qty == 0:
+            mat_pos_u = "Stock not available - Plan for dispatch"
+        else:
+            mat_pos_u = "Unknown"
+
+        next_git_qty_date_n = pullout["eta_date"]
+
+        results[row["id"]] = {
+            "warehouse_stock": warehouse_stock_j,
+            "blg_warehouse_stock": bal_pull,
+            "git_qty": git_qty_l,
+            "next_git_wh_qty": next_git_qty,
+            "next_git_wh_date": next_git_qty_date_n,
+            "safety_stock_alarm": safety_stock_alm_o,
+            "short_fall_demand_qty": short_fall_dem_qty_p,
+            "tot_demand_qty_raise": tot_dem_qty_raise_q,
+            "demand_dt_prod": dem_dt_prod_r,
+            "dem_sea": dem_sea_s,
+            "dem_air": dem_air_t,
+            "mat_pos": mat_pos_u,
+        }
 
-        # Process Data
-        json_data = result
-        df_pullout = json_data.get("PULLOUT", [])
-
-        # Iterate through BMW Supplyon records
-        bmw_supplyon_data = bmw_supplyon.objects.filter(
-            buyer_id="BMW", year=year, created_at_week_no=week_no
-        ).values("id", "buyer_article_no", "order_no", "delivery_quantity", "creation_date", "delivery_date")
-
-        for row in bmw_supplyon_data:
-            article_no = row["buyer_article_no"]
-
-            # Fetch `delivery_date` from bmw_supplyon_data
-            delivery_date = row.get("delivery_date")
-
-            # Find `bal_pull` based on buyer_article_no and delivery_date
-            bal_pull = next((clean_numeric_value(item["BAL_PULLQTY"]) for item in df_pullout if item.get("KDMAT") == article_no), 0)
-
-            # Find `git_qty` where RECEP_FLG != 'X' and FMG == 0
-            git_qty_l = next(
-                (clean_numeric_value(item["PULL_QTY"]) for item in df_pullout if item.get("KDMAT") == article_no and 
-                 item.get("RECEP_FLG") != "X" and clean_numeric_value(item.get("FKIMG")) == 0), 0)
-
-            # Find `next_git_qty` for the next month
-            next_git_qty = 0
-            next_month_date = datetime.now() + timedelta(days=30)
-            for item in df_pullout:
-                if item.get("KDMAT") == article_no:
-                    item_delivery_date = item.get("SDATE")
-                    if item_delivery_date:
-                        delivery_date_obj = datetime.strptime(item_delivery_date, "%Y-%m-%d")
-                        if next_month_date.month == delivery_date_obj.month and next_month_date.year == delivery_date_obj.year:
-                            next_git_qty = clean_numeric_value(item["PULL_QTY"])
-                            break
-
-            # if use delivery_date 
-            from datetime import datetime, timedelta
-
-            # Find `next_git_qty` for the next month
-            next_git_qty = 0
-            next_month_date = datetime.now() + timedelta(days=30)
-
-            # Get `delivery_date` for the article_no from bmw_supplyon_data
-            delivery_date_str = next((row["delivery_date"] for row in bmw_supplyon_data if row["buyer_article_no"] == article_no), None)
-
-            if delivery_date_str:
-                try:
-                    delivery_date_obj = datetime.strptime(delivery_date_str, "%Y-%m-%d")  # Convert to datetime
-
-                    for item in df_pullout:
-                        if item.get("KDMAT") == article_no:
-                            item_delivery_date = item.get("SDATE")  # Still using SDATE from pullout
-
-                            if item_delivery_date:
-                                item_delivery_date_obj = datetime.strptime(item_delivery_date, "%Y-%m-%d")
-
-                                # Compare the delivery date from bmw_supplyon with pullout data
-                                if next_month_date.month == item_delivery_date_obj.month and next_month_date.year == item_delivery_date_obj.year:
-                                    next_git_qty = clean_numeric_value(item["P_QTY"])
-                                    break
-
-                except ValueError as e:
-                    print(f"Error parsing delivery_date: {e}")
+    # Update Database Records
+    updated = write_back(results, year, week_no, buyer_id, batch_size=batch_size)
+    return {"partition": (year, week_no, buyer_id), "rows": len(results), "updated": updated,
+            "seconds": round(time.perf_counter() - start, 3)}
 
 
+def _run_partition(partition, batch_size):
+    try:
+        return process_partition(*partition, batch_size=batch_size)
+    except Exception as e:
+        return {"partition": partition, "error": str(e)}
 
-            # Fetch warehouse stock
-            warehouse_stock_qs = bmw_warehouse.objects.filter(buyer_article_no=article_no).values("warehouse_qty")
-            warehouse_stock_j = warehouse_stock_qs[0]["warehouse_qty"] if warehouse_stock_qs else 0
-            warehouse_stock_j = clean_numeric_value(warehouse_stock_j)
+def portal_bapi(year=None, week_no=None, full_resync=False, partitions=None, workers=PARTITION_WORKERS):
+    """Pulls pullout data once and processes every (year, week, buyer) partition.
 
-            # Compute required quantities
-            safety_stock_alm_o = int(warehouse_stock_j) - int(bal_pull) + int(git_qty_l)
-            short_fall_dem_qty_p = int(clean_numeric_value(row.get("delivery_quantity", 0))) - int(bal_pull)
-            tot_dem_qty_raise_q = safety_stock_alm_o + short_fall_dem_qty_p
+    Without `partitions` only the BMW partition of `year`/`week_no` (default:
+    the current ISO week) is processed. Several partitions run in a process
+    pool of `workers` that all share the same pullout index.
+    """
+    try:
+        if partitions is None:
+            if year is None or week_no is None:
+                iso_year, iso_week, _ = datetime.now().isocalendar()
+                year, week_no = year or iso_year, week_no or iso_week
+            partitions = [(year, week_no, "BMW")]
+        partitions = [tuple(partition) for partition in partitions]
+        batch_size = config("BULK_BATCH_SIZE", default=500, cast=int)
 
-            # Convert Message Date
-            creation_date = row.get("creation_date", "").strip()
-            creation_date = datetime.strptime(creation_date, "%Y-%m-%d") if creation_date else None
+        # Load configuration
+        api_url = config("API_URL")
+        bapi_name = config("BAPI")
+        sold_from = config("CUS_CODE-SOLD_FROM")
 
-            if creation_date:
-                dem_dt_prod_r = creation_date - timedelta(days=100)
-                dem_sea_s = creation_date - timedelta(days=70)
-                dem_air_t = creation_date - timedelta(days=25)
-            else:
-                dem_dt_prod_r = dem_sea_s = dem_air_t = None
-
-            # Material Position Calculation
-            if bal_pull != 0 and git_qty_l == 0 and next_git_qty == 0:
-                mat_pos_u = "Sufficient stock available in warehouse against call-off"
-            elif bal_pull == 0 and git_qty_l != 0 and next_git_qty != 0:
-                mat_pos_u = "Alert on GIT material - Not reported on time against call-off"
-            elif bal_pull == 0 and git_qty_l == 0 and next_git_qty == 0:
-                mat_pos_u = "Stock not available - Plan for dispatch"
+        # Pull only the invoice window since the last run and merge it locally
+        df_pullout = load_pullout(get_sap_session(api_url), bapi_name, sold_from, full_resync=full_resync)
+
+        # Index pullout lines once per run instead of scanning them per row
+        next_month_date = datetime.now() + timedelta(days=30)
+        pullout_index = build_pullout_index(normalize_pullout(df_pullout), next_month_date)
+
+        if len(partitions) == 1 or workers <= 1:
+            _init_partition_worker(pullout_index)
+            summaries = [_run_partition(partition, batch_size) for partition in partitions]
+        else:
+            # Workers open their own DB connections; inherited ones must not be shared
+            db_connections.close_all()
+            with ProcessPoolExecutor(max_workers=min(workers, len(partitions)),
+                                     initializer=_init_partition_worker, initargs=(pullout_index,)) as executor:
+                summaries = list(executor.map(_run_partition, partitions, [batch_size] * len(partitions)))
+
+        for summary in summaries:
+            if "error" in summary:
+                print(f"Partition {summary['partition']} failed: {summary['error']}")
             else:
-                mat_pos_u = "Unknown"
-
-            # Find `ETA_DESTI` based on buyer_article_no (KDMAT in df_pullout)
-            eta_desti = next((item["ETA_DESTI"] for item in df_pullout if item.get("KDMAT") == article_no), None)
-            next_git_qty_date_n = datetime.strptime(eta_desti, "%Y-%m-%d").date() if eta_desti else None
-        
-            # Update Database Record
-            update_records = []
-            for row in bmw_supplyon_data:
-                try:
-                    record = bmw_supplyon.objects.get(pk=row["id"], year=year, created_at_week_no=week_no)
-                    record.warehouse_stock = warehouse_stock_j
-                    record.blg_warehouse_stock = bal_pull
-                    record.git_qty = git_qty_l
-                    record.next_git_wh_qty = next_git_qty
-                    record.next_git_wh_date = next_git_qty_date_n
-                    record.safety_stock_alarm = safety_stock_alm_o
-                    record.short_fall_demand_qty = short_fall_dem_qty_p
-                    record.tot_demand_qty_raise = tot_dem_qty_raise_q
-                    record.demand_dt_prod = dem_dt_prod_r
-                    record.dem_sea = dem_sea_s
-                    record.dem_air = dem_air_t
-                    record.mat_pos = mat_pos_u
-                    update_records.append(record)
-                except Exception as e:
-                    print(f"Error updating record {row['id']}: {str(e)}")
-
-            # Perform bulk update
-            if update_records:
-                bmw_supplyon.objects.bulk_update(
-                    update_records,
-                    [
-                        "warehouse_stock", "blg_warehouse_stock", "git_qty", "next_git_wh_qty", "next_git_wh_date",
-                        "safety_stock_alarm", "short_fall_demand_qty", "tot_demand_qty_raise", "demand_dt_prod",
-                        "dem_sea", "dem_air", "mat_pos"
-                    ]
-                )
+                print(f"Partition {summary['partition']}: updated {summary['updated']} of "
+                      f"{summary['rows']} SupplyOn records in {summary['seconds']}s")
+        return summaries
 
     except Exception as e:
         print(f"Error: {str(e)}")
\ No newline at end of file
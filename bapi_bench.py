@@ -0,0 +1,210 @@
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from datetime import datetime, timedelta
+
+import bench_db
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+class FakePortal:
+    """Stands in for the portal's token/login endpoint."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def post(self, url, json=None, headers=None, timeout=None):
+        self.calls += 1
+        if json["apitype"] == "accesstoken":
+            return FakeResponse({"token": "offline-token", "expires_in": 3600})
+        return FakeResponse({"ip": "localhost", "sysnr": "00", "client": "100",
+                             "user_name": "bench", "password": "bench"})
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    """Stands in for pyrfc.Connection, answering every call with a synthetic PULLOUT."""
+    articles = 50
+    lines_per_article = 20
+
+    def __init__(self, **conn_params):
+        self.alive = True
+
+    def call(self, bapi_name, **parameters):
+        return {"PULLOUT": make_pullout(self.articles, self.lines_per_article)}
+
+    def close(self):
+        self.alive = False
+
+# Allow the harness to run on machines without the SAP NW RFC SDK
+try:
+    import pyrfc  # noqa: F401
+except ImportError:
+    sys.modules["pyrfc"] = types.SimpleNamespace(Connection=FakeConnection)
+sys.modules.setdefault("bmw_supplyon", bench_db.bmw_supplyon)
+sys.modules.setdefault("bmw_warehouse", bench_db.bmw_warehouse)
+
+import bapi
+from bapi import clean_numeric_value, build_pullout_index, normalize_pullout
+
+def make_pullout(articles=2000, lines_per_article=25, seed=42):
+    """Synthesizes a PULLOUT payload shaped like the BAPI response."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    pullout = []
+    for a in range(articles):
+        kdmat = f"ART{a:06d}"
+        for line in range(lines_per_article):
+            sdate = today + timedelta(days=rng.randint(-60, 90))
+            pullout.append({
+                "VBELN": f"{9000000000 + a * lines_per_article + line}",
+                "POSNR": "000010",
+                "KDMAT": kdmat,
+                "BAL_PULLQTY": f"{rng.randint(0, 5000)}.000",
+                "PULL_QTY": f"{rng.randint(0, 2000)}.000",
+                "P_QTY": f"{rng.randint(0, 2000)}.000",
+                "FKIMG": rng.choice(["0.000", f"{rng.randint(1, 2000)}.000"]),
+                "RECEP_FLG": rng.choice(["X", ""]),
+                "SDATE": sdate.strftime("%Y-%m-%d"),
+                "ETA_DESTI": (sdate + timedelta(days=35)).strftime("%Y-%m-%d"),
+            })
+    rng.shuffle(pullout)
+    return pullout
+
+def scan_lookup(df_pullout, article_no, next_month_date):
+    """Per-article lookups as portal_bapi used to do them, one scan each."""
+    bal_pull = next((clean_numeric_value(item["BAL_PULLQTY"]) for item in df_pullout if item.get("KDMAT") == article_no), 0)
+    git_qty = next(
+        (clean_numeric_value(item["PULL_QTY"]) for item in df_pullout if item.get("KDMAT") == article_no and
+         item.get("RECEP_FLG") != "X" and clean_numeric_value(item.get("FKIMG")) == 0), 0)
+    next_git_qty = 0
+    for item in df_pullout:
+        if item.get("KDMAT") == article_no and item.get("SDATE"):
+            sdate = datetime.strptime(item["SDATE"], "%Y-%m-%d")
+            if next_month_date.month == sdate.month and next_month_date.year == sdate.year:
+                next_git_qty = clean_numeric_value(item["P_QTY"])
+                break
+    eta_desti = next((item["ETA_DESTI"] for item in df_pullout if item.get("KDMAT") == article_no), None)
+    eta_date = datetime.strptime(eta_desti, "%Y-%m-%d").date() if eta_desti else None
+    return {"bal_pull": bal_pull, "git_qty": git_qty, "next_git_qty": next_git_qty, "eta_date": eta_date}
+
+def bench_pullout_index(articles=2000, lines_per_article=25, call_offs=1000):
+    df_pullout = make_pullout(articles, lines_per_article)
+    lookups = [f"ART{random.Random(i).randrange(articles):06d}" for i in range(call_offs)]
+    next_month_date = datetime.now() + timedelta(days=30)
+
+    start = time.perf_counter()
+    scanned = [scan_lookup(df_pullout, article_no, next_month_date) for article_no in lookups]
+    scan_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pullout_index = build_pullout_index(normalize_pullout(df_pullout), next_month_date)
+    indexed = [pullout_index[article_no] for article_no in lookups]
+    index_time = time.perf_counter() - start
+
+    assert scanned == indexed, "Indexed lookups differ from full scans"
+    print(f"{len(df_pullout)} pullout lines, {call_offs} call-offs: "
+          f"scan {scan_time:.3f}s, index {index_time:.3f}s ({scan_time / index_time:.1f}x)")
+
+def seed_supplyon(articles, call_offs_per_article, year, week_no, seed=7):
+    """Seeds SupplyOn call-offs and warehouse stock for the synthetic articles."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    supplyon_rows, warehouse_rows = [], []
+    for a in range(articles):
+        article_no = f"ART{a:06d}"
+        for _ in range(call_offs_per_article):
+            supplyon_rows.append(bench_db.bmw_supplyon(
+                buyer_id="BMW", year=year, created_at_week_no=week_no, buyer_article_no=article_no,
+                order_no=f"PO{a:06d}", delivery_quantity=str(rng.randint(0, 3000)),
+                creation_date=(today - timedelta(days=rng.randint(0, 7))).strftime("%Y-%m-%d"),
+                delivery_date=(today + timedelta(days=rng.randint(0, 120))).strftime("%Y-%m-%d"),
+            ))
+        if rng.random() < 0.9:
+            warehouse_rows.append(bench_db.bmw_warehouse(
+                buyer_article_no=article_no, warehouse_qty=str(rng.randint(0, 10000)), entry_date=today.date()))
+    bench_db.bmw_supplyon.objects.bulk_create(supplyon_rows, batch_size=500)
+    bench_db.bmw_warehouse.objects.bulk_create(warehouse_rows, batch_size=500)
+
+def bench_write_back(row_counts=(100, 1000, 5000), batch_size=500):
+    """Checks write_back's queries grow linearly: one SELECT plus one UPDATE per `batch_size` rows,
+    as far as the backend's parameter limit allows."""
+    bench_db.create_tables()
+    year, week_no, _ = datetime.now().isocalendar()
+    for rows in row_counts:
+        bench_db.reset_tables()
+        seed_supplyon(rows, 1, year, week_no)
+        ids = list(bench_db.bmw_supplyon.objects.values_list("id", flat=True))
+        results = {pk: {"warehouse_stock": pk % 97, "mat_pos": "Unknown"} for pk in ids}
+
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            updated = bapi.write_back(results, year, week_no, batch_size=batch_size)
+        wall = time.perf_counter() - start
+
+        selects = sum(query["sql"].startswith("SELECT") for query in queries)
+        updates = sum(query["sql"].startswith("UPDATE") for query in queries)
+        # The backend caps both batches by its query-parameter limit (999 on SQLite, none on PostgreSQL)
+        select_batch = connection.features.max_query_params or rows
+        update_batch = min(batch_size, connection.ops.bulk_batch_size(["pk", "pk"] + bapi.UPDATE_FIELDS, []))
+        expected = (math.ceil(rows / select_batch), math.ceil(rows / update_batch))
+        assert updated == rows, f"expected {rows} rows written, got {updated}"
+        assert (selects, updates) == expected, \
+            f"{rows} rows: expected {expected[0]} SELECTs and {expected[1]} UPDATEs, got {selects} and {updates}"
+        print(f"write_back, {rows} rows: {selects} SELECT(s) + {updates} UPDATEs, {wall:.2f}s")
+
+def bench_portal_bapi(pullout_lines=(1000, 10000, 100000), lines_per_article=20, call_offs_per_article=2):
+    """Runs portal_bapi end to end against the fake portal, fake RFC and SQLite.
+
+    Reports wall time, DB query count and peak Python memory per payload size.
+    """
+    os.environ.setdefault("API_URL", "http://offline.invalid/api")
+    os.environ.setdefault("BAPI", "Z_BENCH_PULLOUT")
+    os.environ.setdefault("CUS_CODE-SOLD_FROM", "BENCH")
+    os.environ.setdefault("INV_DT-FROM_DATE", datetime.now().strftime("%Y%m01"))
+    os.chdir(tempfile.mkdtemp(prefix="bapi_bench_"))
+    bench_db.create_tables()
+    year, week_no, _ = datetime.now().isocalendar()
+
+    for lines in pullout_lines:
+        articles = max(1, lines // lines_per_article)
+        FakeConnection.articles = articles
+        FakeConnection.lines_per_article = lines_per_article
+        bench_db.reset_tables()
+        seed_supplyon(articles, call_offs_per_article, year, week_no)
+        bapi._sap_sessions.clear()
+        bapi._sap_sessions[os.environ["API_URL"]] = bapi.SapSession(
+            os.environ["API_URL"], http=FakePortal(), connection_factory=FakeConnection)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            bapi.portal_bapi(year=year, week_no=week_no, full_resync=True)
+        wall = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        updated = bench_db.bmw_supplyon.objects.filter(mat_pos__isnull=False).count()
+        print(f"{lines:>7} pullout lines, {articles * call_offs_per_article} call-offs: "
+              f"{wall:.2f}s, {len(queries)} queries, peak {peak / 2 ** 20:.1f} MiB, {updated} rows updated")
+
+if __name__ == '__main__':
+    bench_pullout_index()
+    bench_write_back()
+    bench_portal_bapi()
@@ -0,0 +1,59 @@
+import django
+from django.conf import settings
+
+# In-memory SQLite stand-in for the SupplyOn/warehouse tables used by the benchmarks
+if not settings.configured:
+    settings.configure(
+        DATABASES={"default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}},
+        INSTALLED_APPS=[],
+        USE_TZ=False,
+    )
+    django.setup()
+
+from django.db import connection, models
+
+class bmw_supplyon(models.Model):
+    buyer_id = models.CharField(max_length=20, default="BMW")
+    year = models.IntegerField(null=True)
+    created_at_week_no = models.IntegerField(null=True)
+    buyer_article_no = models.CharField(max_length=50, db_index=True)
+    order_no = models.CharField(max_length=50, blank=True, default="")
+    delivery_quantity = models.CharField(max_length=20, blank=True, default="")
+    creation_date = models.CharField(max_length=20, blank=True, default="")
+    delivery_date = models.CharField(max_length=20, blank=True, default="")
+    warehouse_stock = models.IntegerField(null=True)
+    blg_warehouse_stock = models.IntegerField(null=True)
+    git_qty = models.IntegerField(null=True)
+    next_git_wh_qty = models.IntegerField(null=True)
+    next_git_wh_date = models.DateField(null=True)
+    safety_stock_alarm = models.IntegerField(null=True)
+    short_fall_demand_qty = models.IntegerField(null=True)
+    tot_demand_qty_raise = models.IntegerField(null=True)
+    demand_dt_prod = models.DateField(null=True)
+    dem_sea = models.DateField(null=True)
+    dem_air = models.DateField(null=True)
+    mat_pos = models.CharField(max_length=100, null=True)
+
+    class Meta:
+        app_label = "bench"
+
+class bmw_warehouse(models.Model):
+    buyer_article_no = models.CharField(max_length=50, db_index=True)
+    warehouse_qty = models.CharField(max_length=20, blank=True, default="")
+    entry_date = models.DateField(null=True)
+
+    class Meta:
+        app_label = "bench"
+
+def create_tables():
+    """Creates the bench tables, or empties them when an earlier bench in this process already did."""
+    existing = set(connection.introspection.table_names())
+    with connection.schema_editor() as editor:
+        for model in (bmw_supplyon, bmw_warehouse):
+            if model._meta.db_table not in existing:
+                editor.create_model(model)
+    reset_tables()
+
+def reset_tables():
+    bmw_supplyon.objects.all().delete()
+    bmw_warehouse.objects.all().delete()
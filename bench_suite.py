@@ -0,0 +1,201 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from projection_bench import HERE, load_snippet
+
+# name: (snippet file, function, keyword arguments, input kind)
+IMPLEMENTATIONS = {
+    'final.compute': ('final', 'compute', {'snapshot_ttl': 0}, 'db'),
+    'final.stock': ('final', 'stock', {'snapshot_ttl': 0}, 'db'),
+    'final.refresh': ('final', 'refresh', {'snapshot_ttl': 0}, 'db'),
+    'month.compute_blg_stock_final': ('month', 'compute_blg_stock_final', {'snapshot_ttl': 0, 'full_recompute': True}, 'db'),
+    'B.compute_blg_stock_from_df': ('B', 'compute_blg_stock_from_df', {}, 'frames'),
+    'Tag.compute_blg_stock_final': ('Tag', 'compute_blg_stock_final', {}, 'records'),
+}
+HISTORY = os.path.join(HERE, 'bench_history.json')
+
+def generate(articles, months, density, seed=1, deliveries_per_month=4):
+    """Seeded raw SupplyOn call-offs, pullout lines and warehouse snapshots.
+
+    Columns are strings as the tables and the BAPI deliver them; `density` is
+    pullout lines per article and month of horizon.
+    """
+    rng = np.random.default_rng(seed)
+    today = datetime.today().date()
+    article_nos = np.array([f'ART{a:06d}' for a in range(articles)])
+    horizon = months * 30
+
+    calls = articles * months * deliveries_per_month
+    delivery_dates = pd.Series(pd.Timestamp(today) + pd.to_timedelta(rng.integers(-14, horizon, calls), unit='D')).dt.strftime('%Y-%m-%d')
+    supplyon = pd.DataFrame({
+        'buyer_article_no': np.repeat(article_nos, months * deliveries_per_month),
+        'order_no': [f'PO{n:08d}' for n in rng.integers(0, 10 ** 8, calls)],
+        'delivery_quantity': rng.integers(0, 800, calls).astype(str),
+        'creation_date': (today - timedelta(days=7)).isoformat(),
+        'delivery_date': np.where(rng.random(calls) < 0.02, 'Backorder', delivery_dates),
+    })
+
+    lines = articles * months * density
+    pullout = pd.DataFrame({
+        'buyer_article_no': article_nos[rng.integers(0, articles, lines)],
+        'con_date': pd.Series(pd.Timestamp(today) + pd.to_timedelta(rng.integers(-90, horizon, lines), unit='D')).dt.strftime('%Y-%m-%d'),
+        'FKIMG': pd.Series(rng.integers(0, 2000, lines)).map('{}.000'.format),
+        'RECEP_FLG': np.where(rng.random(lines) < 0.4, 'X', ''),
+    })
+
+    stocked = article_nos[rng.random(articles) < 0.9]
+    warehouse = pd.DataFrame({
+        'buyer_article_no': np.repeat(stocked, 3),
+        'warehouse_qty': rng.integers(0, 10000, len(stocked) * 3).astype(str),
+        'entry_date': [today - timedelta(days=int(d)) for d in rng.integers(0, 60, len(stocked) * 3)],
+    })
+    return supplyon, pullout, warehouse
+
+def snippet_namespace(pullout):
+    """What the views module provides to the snippets, backed by the bench SQLite tables."""
+    import bench_db
+    from django.db import transaction
+
+    def call_data(model, data):
+        return pd.DataFrame(list(model.objects.values())), pullout.copy()
+
+    namespace = {'supplyon_bmw': bench_db.bmw_supplyon, 'bmw_warehouse': bench_db.bmw_warehouse,
+                 'transaction': transaction, 'call_data': call_data}
+    for name in ('warehouse', 'snapshot', 'writer', 'instrument', 'split'):
+        namespace.update({key: value for key, value in load_snippet(name, namespace).items()
+                          if not key.startswith('__')})
+    return namespace
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_one(name, articles, months, density, seed):
+    """Seeds a fresh in-memory database and runs one implementation; returns its measurements."""
+    import bench_db
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    os.chdir(tempfile.mkdtemp(prefix='bench_suite_'))
+    bench_db.create_tables()
+    supplyon, pullout, warehouse = generate(articles, months, density, seed)
+    bench_db.bmw_supplyon.objects.bulk_create(
+        [bench_db.bmw_supplyon(**row) for row in supplyon.to_dict('records')], batch_size=1000)
+    bench_db.bmw_warehouse.objects.bulk_create(
+        [bench_db.bmw_warehouse(**row) for row in warehouse.to_dict('records')], batch_size=1000)
+
+    snippet, function, kwargs, kind = IMPLEMENTATIONS[name]
+    namespace = snippet_namespace(pullout)
+    target = load_snippet(snippet, namespace)[function]
+    if kind == 'frames':
+        args = namespace['call_data'](bench_db.bmw_supplyon, {"IT_PULLOUT": []})
+    elif kind == 'records':
+        loaded = pd.DataFrame(list(bench_db.bmw_supplyon.objects.values('id', 'buyer_article_no', 'delivery_date', 'delivery_quantity')))
+        loaded['delivery_date'] = pd.to_datetime(loaded['delivery_date'], errors='coerce')
+        loaded = loaded.dropna(subset=['delivery_date'])
+        args = ([{'id': row.id, 'buyer_article_no': row.buyer_article_no, 'delivery_date': row.delivery_date.date(),
+                  'delivery_qty': float(row.delivery_quantity), 'blg_warehouse_stock': 0}
+                 for row in loaded.itertuples(index=False)],)
+    else:
+        args = ()
+
+    rss_before = peak_rss_mib()
+    with CaptureQueriesContext(connection) as queries, contextlib.redirect_stdout(sys.stderr):
+        start = time.perf_counter()
+        target(*args, **kwargs)
+        wall = time.perf_counter() - start
+    return {'implementation': name, 'wall_s': round(wall, 4), 'queries': len(queries),
+            'peak_rss_mib': round(peak_rss_mib(), 1), 'rss_before_mib': round(rss_before, 1),
+            'call_offs': len(supplyon), 'pullout_lines': len(pullout)}
+
+def run_isolated(name, scale, seed):
+    """Runs one implementation in a fresh interpreter so peak RSS is its own."""
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', name, *map(str, scale), str(seed)],
+        cwd=HERE, capture_output=True, text=True)
+    if completed.returncode != 0:
+        error = (completed.stderr.strip().splitlines() or ['exit code %d' % completed.returncode])[-1]
+        return {'implementation': name, 'error': error}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def previous_result(history, name, scale):
+    for run in reversed(history):
+        if run['scale'] == dict(zip(('articles', 'months', 'density'), scale)):
+            for result in run['results']:
+                if result['implementation'] == name and 'wall_s' in result:
+                    return result
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the projection snippets on synthetic SupplyOn data.')
+    parser.add_argument('--articles', type=int, nargs='+', default=[100, 400])
+    parser.add_argument('--months', type=int, nargs='+', default=[3])
+    parser.add_argument('--density', type=int, nargs='+', default=[4], help='pullout lines per article and month')
+    parser.add_argument('--only', nargs='+', choices=sorted(IMPLEMENTATIONS), default=sorted(IMPLEMENTATIONS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--history', default=HISTORY, help='JSON file the runs are appended to')
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.history, encoding='utf-8') as f:
+            history = json.load(f)
+    except FileNotFoundError:
+        history = []
+
+    for articles in args.articles:
+        for months in args.months:
+            for density in args.density:
+                scale = (articles, months, density)
+                print(f"articles={articles} months={months} density={density}")
+                results = []
+                for name in args.only:
+                    result = run_isolated(name, scale, args.seed)
+                    results.append(result)
+                    if 'error' in result:
+                        print(f"  {name:<32} failed: {result['error']}")
+                        continue
+                    previous = previous_result(history, name, scale)
+                    change = f" ({result['wall_s'] / previous['wall_s'] - 1:+.0%} vs last)" if previous and previous['wall_s'] else ""
+                    print(f"  {name:<32} {result['wall_s']:>8.2f}s {result['queries']:>6} queries "
+                          f"{result['peak_rss_mib']:>7.1f} MiB peak RSS{change}")
+                history.append({
+                    'timestamp': datetime.now().isoformat(timespec='seconds'),
+                    'revision': git_revision(),
+                    'python': platform.python_version(),
+                    'pandas': pd.__version__,
+                    'numpy': np.__version__,
+                    'seed': args.seed,
+                    'scale': {'articles': articles, 'months': months, 'density': density},
+                    'results': results,
+                })
+
+    tmp_path = f"{args.history}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, args.history)
+    print(f"History: {args.history} ({len(history)} runs)")
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--worker':
+        name, articles, months, density, seed = sys.argv[2], *map(int, sys.argv[3:7])
+        print(json.dumps(run_one(name, articles, months, density, seed)))
+    else:
+        main()
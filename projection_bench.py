@@ -0,0 +1,666 @@
+import ast
+import os
+import time
+import tracemalloc
+import types
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def load_snippet(name, namespace=None):
+    """Loads the function definitions of a projection snippet file.
+
+    The snippets are pasted into the Django views module and call themselves
+    at the bottom, so only their `def`s, classes, imports and module-level constants
+    are executed, in a namespace that provides what the views module would.
+    """
+    with open(os.path.join(HERE, name), encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=name)
+    tree.body = [node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Import, ast.ImportFrom, ast.Assign))]
+    module = types.ModuleType(f'snippet_{name}')
+    module.__dict__.update({'pd': pd, 'np': np, 'datetime': datetime, 'timedelta': timedelta, **(namespace or {})})
+    exec(compile(tree, name, 'exec'), module.__dict__)
+    return module.__dict__
+
+def make_supplyon(articles=2000, months=4, deliveries_per_month=4, seed=7):
+    """Synthesizes cleaned SupplyOn call-offs: distinct delivery days per article."""
+    rng = np.random.default_rng(seed)
+    today = pd.to_datetime(datetime.today().date())
+    horizon = months * 30
+    per_article = min(months * deliveries_per_month, horizon)
+    days = np.concatenate([rng.choice(np.arange(-14, horizon), per_article, replace=False) for _ in range(articles)])
+    return pd.DataFrame({
+        'id': np.arange(1, articles * per_article + 1),
+        'buyer_article_no': np.repeat([f'ART{a:06d}' for a in range(articles)], per_article),
+        'delivery_date': today + pd.to_timedelta(days, unit='D'),
+        'delivery_quantity': rng.integers(0, 800, articles * per_article).astype(float),
+    })
+
+def make_pullout(articles=5000, rows=200000, seed=42):
+    """Synthesizes cleaned pullout lines as the projection functions see them."""
+    rng = np.random.default_rng(seed)
+    today = pd.to_datetime(datetime.today().date())
+    return pd.DataFrame({
+        'buyer_article_no': pd.Series(rng.integers(0, articles, rows)).map('ART{:06d}'.format),
+        'con_date': today + pd.to_timedelta(rng.integers(-180, 180, rows), unit='D'),
+        'FKIMG': rng.integers(0, 2000, rows).astype(float),
+        'RECEP_FLG': np.where(rng.random(rows) < 0.4, 'X', ''),
+    })
+
+def blg_totals_of(pullout):
+    blg_df = pullout[pullout['RECEP_FLG'] == 'X'].groupby('buyer_article_no', as_index=False)['FKIMG'].sum()
+    return blg_df.rename(columns={'FKIMG': 'total_blg'})
+
+def masked_lookup(pullout, blg_df, articles, today):
+    """Per-article BLG total and open pullout slice, masking the full frames each time."""
+    out = {}
+    for article in articles:
+        stock_row = blg_df.loc[blg_df['buyer_article_no'] == article, 'total_blg']
+        stock_val = int(stock_row.iloc[0]) if not stock_row.empty else 0
+        future_pullout = pullout[
+            (pullout['buyer_article_no'] == article) &
+            (pullout['RECEP_FLG'] != 'X') &
+            (pullout['con_date'] > today)
+        ].sort_values('con_date')
+        out[article] = (stock_val, future_pullout['FKIMG'].tolist(), future_pullout['con_date'].tolist())
+    return out
+
+def split_lookup(pullout, blg_df, articles, today):
+    """Same lookups served from the `split` snippet's frames, split by article once up front."""
+    blg_totals, pullout_by_article, no_pullout = load_snippet('split')['split_by_article'](pullout, blg_df, today)
+    out = {}
+    for article in articles:
+        stock_val = int(blg_totals.get(article, 0))
+        future_pullout = pullout_by_article.get(article, no_pullout).sort_values('con_date')
+        out[article] = (stock_val, future_pullout['FKIMG'].tolist(), future_pullout['con_date'].tolist())
+    return out
+
+def legacy_month_projection(supplyon, pullout, today):
+    """Reference: the per-article iterrows projection `month` used before vectorizing."""
+    blg_df = pullout[pullout['RECEP_FLG'] == 'X'].groupby('buyer_article_no', as_index=False)['FKIMG'].sum()
+    blg_df = blg_df.rename(columns={'FKIMG': 'total_blg'})
+    supplyon_sorted = supplyon.sort_values(['buyer_article_no', 'delivery_date'])
+    blg_totals = dict(zip(blg_df['buyer_article_no'], blg_df['total_blg']))
+    open_pullout = pullout[(pullout['RECEP_FLG'] != 'X') & (pullout['con_date'] > today)]
+    pullout_by_article = dict(tuple(open_pullout.groupby('buyer_article_no', sort=False)))
+    no_pullout = open_pullout.iloc[0:0]
+    rows = []
+    for article, group in supplyon_sorted.groupby('buyer_article_no', sort=False):
+        group = group.sort_values('delivery_date').copy()
+        stock_val = int(blg_totals.get(article, 0))
+        future_pullout = pullout_by_article.get(article, no_pullout).sort_values('con_date')
+        con_date_list = future_pullout['con_date'].tolist()
+        fkimg_list = (
+            future_pullout
+            .sort_values('FKIMG', ascending=False)
+            .drop_duplicates(subset=['buyer_article_no', 'con_date'], keep='first')['FKIMG']
+            .tolist()
+        )
+        month_map = {}
+        delivery_months = group[group['delivery_date'] >= today]['delivery_date'].dt.to_period('M').unique().tolist()
+        for month in delivery_months:
+            month_end = pd.Period(month, freq='M').end_time
+            for j, con_date in enumerate(con_date_list):
+                if month_end <= con_date:
+                    git_qty = sum(fkimg_list[j:]) if j < len(fkimg_list) else 0
+                    next_git_qty = fkimg_list[j] if j < len(fkimg_list) else 0
+                    month_map[month] = (git_qty, next_git_qty, con_date)
+                    break
+            else:
+                month_map[month] = (0, 0, pd.NaT)
+        group['month'] = group['delivery_date'].dt.to_period('M')
+        # Float columns: older pandas upcast the int 0 columns on fractional FKIMG, pandas 3 refuses
+        group['git_qty'] = 0.0
+        group['next_git_wh_qty'] = 0.0
+        group['next_git_wh_date'] = pd.NaT
+        for month, (git_qty, next_git_qty, next_git_date) in month_map.items():
+            group.loc[group['month'] == month, 'git_qty'] = git_qty
+            group.loc[group['month'] == month, 'next_git_wh_qty'] = next_git_qty
+            group.loc[group['month'] == month, 'next_git_wh_date'] = next_git_date
+        previous_stock_val = stock_val
+        for idx, row in group.iterrows():
+            if pd.isna(row['delivery_date']) or row['delivery_date'] < today:
+                continue
+            rows.append((row['id'], previous_stock_val if previous_stock_val > 0 else 0,
+                         row['git_qty'], row['next_git_wh_qty'], row['next_git_wh_date']))
+            previous_stock_val = int(previous_stock_val + row['next_git_wh_qty'] - row['delivery_quantity'])
+    return rows
+
+def projection_rows(projection):
+    """Normalizes a projection frame to comparable (id, blg, git, next_git, next_date) tuples."""
+    return sorted(
+        (int(r.id), int(r.blg_warehouse_stock), float(r.git_qty), float(r.next_git_wh_qty),
+         pd.Timestamp(r.next_git_wh_date) if pd.notna(r.next_git_wh_date) else None)
+        for r in projection.itertuples(index=False)
+    )
+
+def bench_month_projection(articles=2000, months=4, pullout_rows=80000):
+    """Golden check and timing of the vectorized `month` projection against the legacy loop,
+    with whole and fractional quantities (the loop cuts the stock to whole units per delivery)."""
+    today = pd.to_datetime(datetime.today().date())
+    project_blg_stock = load_snippet('month')['project_blg_stock']
+    for fraction in (0.0, 0.5):
+        supplyon = make_supplyon(articles, months)
+        pullout = make_pullout(articles, pullout_rows)
+        supplyon['delivery_quantity'] += fraction
+        pullout['FKIMG'] += fraction
+
+        start = time.perf_counter()
+        legacy = legacy_month_projection(supplyon, pullout, today)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        projection = project_blg_stock(supplyon, pullout, today)
+        vector_time = time.perf_counter() - start
+
+        expected = sorted(
+            (int(i), int(blg), float(git), float(nxt), pd.Timestamp(date) if pd.notna(date) else None)
+            for i, blg, git, nxt, date in legacy
+        )
+        assert (projection['blg_warehouse_stock'] % 1 == 0).all(), "BLG stock should be whole units"
+        assert projection_rows(projection) == expected, \
+            f"Vectorized projection differs from the legacy loop (quantities +{fraction})"
+        print(f"month projection, {len(supplyon)} deliveries x {pullout_rows} pullout rows, quantities +{fraction}: "
+              f"legacy {legacy_time:.2f}s, vectorized {vector_time:.2f}s ({legacy_time / vector_time:.1f}x)")
+
+def make_positions_input(rows=100000, articles=2000, seed=5):
+    """Synthesizes projected SupplyOn rows as `stock()` reads them, including unparseable values."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'id': np.arange(1, rows + 1),
+        'buyer_article_no': pd.Series(rng.integers(0, articles, rows)).map('ART{:06d}'.format),
+        'blg_warehouse_stock': rng.choice(['0', '250', '1200', '-40', None], rows),
+        'delivery_quantity': rng.choice(['0', '300', '812.5', '', None], rows),
+        'git_qty': rng.choice([0, 150, 900, None], rows),
+        'creation_date': rng.choice(['2025-01-06', '2025-02-03', None], rows),
+    })
+
+def legacy_material_positions(supplyon, latest_stock, now):
+    """Reference: the iterrows/safe_number pass `stock()` used before vectorizing."""
+    def safe_number(val, dtype=float):
+        num = pd.to_numeric(val, errors='coerce')
+        return dtype(num) if pd.notna(num) else dtype(0)
+    rows = []
+    for _, row in supplyon.iterrows():
+        blg_stock = safe_number(row.get('blg_warehouse_stock'), int)
+        git_qty = safe_number(row.get('git_qty'), int)
+        safety_alarm = latest_stock.get(row.get('buyer_article_no'), 0) - blg_stock
+        shortfall_demand = safe_number(row.get('delivery_quantity'), int) - blg_stock
+        total_demand = safety_alarm + shortfall_demand
+        if pd.notna(pd.to_datetime(row.get('creation_date'), errors='coerce')):
+            dates = tuple((now - timedelta(days=days)).date() for days in (100, 70, 25))
+        else:
+            dates = (None, None, None)
+        if blg_stock > 0:
+            mat_pos = 'Sufficient stock available in warehouse against call off'
+        elif blg_stock == 0 and git_qty != 0:
+            mat_pos = 'Alert on GIT material - Not reported on time against call-off'
+        else:
+            mat_pos = 'Stock not available - Plan for dispatch'
+        rows.append((row['id'], mat_pos, *dates, max(total_demand, 0), max(safety_alarm, 0), max(shortfall_demand, 0)))
+    return rows
+
+def bench_material_positions(rows=100000, articles=2000):
+    """Golden check and timing of the columnar `stock()` pass against the row loop."""
+    now = datetime.now()
+    supplyon = make_positions_input(rows, articles)
+    latest_stock = {f'ART{a:06d}': a * 7 % 5000 for a in range(0, articles, 2)}
+    material_positions = load_snippet('final')['material_positions']
+
+    start = time.perf_counter()
+    legacy = legacy_material_positions(supplyon, latest_stock, now)
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    positions = material_positions(supplyon, latest_stock, now)
+    vector_time = time.perf_counter() - start
+
+    assert [tuple(r) for r in positions.itertuples(index=False)] == legacy, "Columnar positions differ from the row loop"
+    print(f"material positions, {rows} rows: legacy {legacy_time:.2f}s, "
+          f"vectorized {vector_time:.3f}s ({legacy_time / vector_time:.1f}x)")
+
+def legacy_project_stock(supplyon, pullout, today, latest_stock):
+    """Reference: `final.project_stock` before it was split into flat per-article arrays."""
+    blg_df = pullout[pullout['RECEP_FLG'] == 'X'].groupby('buyer_article_no', as_index=False)['FKIMG'].sum()
+    blg_totals = dict(zip(blg_df['buyer_article_no'], blg_df['FKIMG']))
+    supplyon_sorted = supplyon.sort_values(['buyer_article_no', 'delivery_date'])
+    open_pullout = pullout[(pullout['RECEP_FLG'] != 'X') & (pullout['con_date'] > today)]
+    pullout_by_article = dict(tuple(open_pullout.groupby('buyer_article_no', sort=False)))
+    no_pullout = open_pullout.iloc[0:0]
+    projected = []
+    for article, group in supplyon_sorted.groupby('buyer_article_no', sort=False):
+        group = group.sort_values('delivery_date')
+        previous_stock_val = int(blg_totals.get(article, 0))
+        # The loop sorted with the default quicksort, which leaves same-day lines in arbitrary order;
+        # project_stock keeps them in pullout order, and so does this reference
+        future_pullout = pullout_by_article.get(article, no_pullout).sort_values('con_date', kind='stable')
+        total_fkimg = future_pullout['FKIMG'].sum()
+        fkimg_counts = future_pullout['FKIMG'].value_counts()
+        fkimgs = future_pullout[future_pullout['FKIMG'].isin(fkimg_counts[fkimg_counts == 1].index)]['FKIMG'].tolist()
+        con_dates = future_pullout.drop_duplicates(subset=['buyer_article_no', 'con_date'], keep='first')['con_date'].tolist()
+        future_rows = group[group['delivery_date'] >= today].copy().sort_values('delivery_date')
+        row_index = 0
+        con_added = False
+        first_set = False
+        for i, con_date in enumerate(con_dates):
+            if i == 0:
+                git_qty = int(total_fkimg)
+            elif i <= len(fkimgs):
+                git_qty = int(fkimgs[i - 1])
+            else:
+                git_qty = 0
+            next_git_qty = git_qty - fkimgs[i] if i < len(fkimgs) else git_qty
+            while row_index < len(future_rows):
+                row = future_rows.iloc[row_index]
+                if row['delivery_date'] > con_date:
+                    con_added = False
+                    break
+                if not first_set:
+                    first_set = True
+                elif i > 0 and not con_added:
+                    previous_stock_val += next_git_qty
+                    con_added = True
+                projected.append((row['id'], article, int(previous_stock_val) if int(previous_stock_val) > 0 else None,
+                                  git_qty, int(next_git_qty), con_dates[i], latest_stock.get(article, 0)))
+                previous_stock_val -= row['delivery_quantity']
+                row_index += 1
+        while row_index < len(future_rows):
+            row = future_rows.iloc[row_index]
+            projected.append((row['id'], article, int(previous_stock_val) if int(previous_stock_val) > 0 else 0,
+                              0, 0, None, latest_stock.get(article, 0)))
+            previous_stock_val -= row['delivery_quantity']
+            row_index += 1
+    return projected
+
+def stock_projection_rows(projection):
+    return [(int(i), article, None if blg is None or pd.isna(blg) else int(blg), int(git), int(nxt),
+             pd.Timestamp(date) if date is not None and pd.notna(date) else None, int(stock))
+            for i, article, blg, git, nxt, date, stock in projection.itertuples(index=False)]
+
+def bench_stock_projection(articles=1000, months=4, pullout_rows=40000):
+    """Golden check and timing of `final.project_stock` against the pre-refactor per-article loop,
+    with whole and fractional quantities."""
+    today = pd.to_datetime(datetime.today().date())
+    project_stock = load_snippet('final', {'PROJECTION_FIELDS': load_snippet('writer')['PROJECTION_FIELDS']})['project_stock']
+    latest_stock = {f'ART{a:06d}': a % 13 * 100 for a in range(0, articles, 2)}
+    for fraction in (0.0, 0.5):
+        supplyon = make_supplyon(articles, months)
+        pullout = make_pullout(articles, pullout_rows)
+        supplyon['delivery_quantity'] += fraction
+        pullout['FKIMG'] += fraction
+
+        start = time.perf_counter()
+        legacy = legacy_project_stock(supplyon, pullout, today, latest_stock)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        projection = project_stock(supplyon, pullout, today, latest_stock)
+        array_time = time.perf_counter() - start
+
+        expected = [(int(i), article, blg, int(git), int(nxt), pd.Timestamp(date) if date is not None else None, int(stock))
+                    for i, article, blg, git, nxt, date, stock in legacy]
+        assert stock_projection_rows(projection) == expected, \
+            f"project_stock differs from the pre-refactor loop (quantities +{fraction})"
+        print(f"stock projection, {len(supplyon)} deliveries x {pullout_rows} pullout rows, quantities +{fraction}: "
+              f"legacy {legacy_time:.2f}s, arrays {array_time:.2f}s ({legacy_time / array_time:.1f}x)")
+
+def raw_call_data(articles=20000, months=4, pullout_rows=1000000):
+    """Synthesizes call_data-shaped frames: string columns as loaded, plus columns the projection ignores."""
+    supplyon = make_supplyon(articles, months)
+    supplyon['delivery_date'] = supplyon['delivery_date'].dt.strftime('%Y-%m-%d')
+    supplyon['delivery_quantity'] = supplyon['delivery_quantity'].astype(int).astype(str)
+    supplyon['order_no'] = 'PO' + supplyon['buyer_article_no'].str[3:]
+    supplyon['creation_date'] = supplyon['delivery_date']
+    supplyon['mat_pos'] = 'Stock not available - Plan for dispatch'
+    pullout = make_pullout(articles, pullout_rows)
+    pullout['con_date'] = pullout['con_date'].dt.strftime('%Y-%m-%d')
+    pullout['FKIMG'] = pullout['FKIMG'].astype(int).astype(str) + '.000'
+    pullout['VBELN'] = pd.Series(np.arange(pullout_rows) + 9000000000).astype(str)
+    return supplyon.astype(object), pullout.astype(object)
+
+def bench_lean_inputs(articles=20000, months=4, pullout_rows=1000000):
+    """Compares `final`'s regular and lean input cleaning: frame sizes, traced peak, identical projection."""
+    today = pd.to_datetime(datetime.today().date())
+    supplyon, pullout = raw_call_data(articles, months, pullout_rows)
+    final = load_snippet('final', {'PROJECTION_FIELDS': load_snippet('writer')['PROJECTION_FIELDS']})
+    projections = []
+    for lean in (False, True):
+        tracemalloc.start()
+        start = time.perf_counter()
+        inputs = final['clean_inputs'](supplyon, pullout, today, lean)
+        projections.append(final['project_stock'](*inputs, today, {}))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        frame_bytes = sum(int(frame.memory_usage(deep=True).sum()) for frame in inputs)
+        print(f"{'lean' if lean else 'regular'} inputs, {len(supplyon)} call-offs x {pullout_rows} pullout rows: "
+              f"frames {frame_bytes / 2 ** 20:.1f} MiB, traced peak {peak / 2 ** 20:.1f} MiB, {elapsed:.2f}s")
+        del inputs
+    regular, lean = projections
+    pd.testing.assert_frame_equal(lean.astype({'buyer_article_no': object}), regular.astype({'buyer_article_no': object}))
+
+def bench_latest_warehouse(articles=2000, snapshots_per_article=5, seed=11):
+    """Checks the latest-snapshot lookup against per-article queries and counts queries."""
+    import bench_db
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    bench_db.create_tables()
+    rng = np.random.default_rng(seed)
+    today = datetime.today().date()
+    bench_db.bmw_warehouse.objects.bulk_create([
+        bench_db.bmw_warehouse(buyer_article_no=f'ART{a:06d}', warehouse_qty=str(rng.integers(0, 10000)),
+                               entry_date=today - timedelta(days=int(d)))
+        for a in range(articles)
+        for d in rng.choice(365, snapshots_per_article, replace=False)
+    ], batch_size=500)
+    latest_warehouse_stock = load_snippet('warehouse', {'bmw_warehouse': bench_db.bmw_warehouse})['latest_warehouse_stock']
+    article_nos = [f'ART{a:06d}' for a in range(articles + 10)]
+
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as per_article_queries:
+        expected = {}
+        for article in article_nos:
+            latest = bench_db.bmw_warehouse.objects.filter(buyer_article_no=article).order_by('-entry_date').first()
+            expected[article] = int(latest.warehouse_qty) if latest else 0
+    per_article_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as lookup_queries:
+        latest_stock = latest_warehouse_stock()
+    lookup_time = time.perf_counter() - start
+
+    assert {article: latest_stock.get(article, 0) for article in article_nos} == expected
+    assert len(lookup_queries) == 1, f"expected 1 query, got {len(lookup_queries)}"
+    print(f"latest warehouse snapshot for {articles} articles: per-article {len(per_article_queries)} queries "
+          f"{per_article_time:.2f}s, lookup {len(lookup_queries)} query {lookup_time:.3f}s")
+
+def bench_snapshot(rows=50000, pullout_rows=200000, seed=3):
+    """Times call_data against its on-disk snapshot and checks the round trip, watermark and invalidation."""
+    import tempfile
+    import bench_db
+
+    bench_db.create_tables()
+    rng = np.random.default_rng(seed)
+    today = datetime.today().date()
+    bench_db.bmw_supplyon.objects.bulk_create([
+        bench_db.bmw_supplyon(buyer_article_no=f'ART{a:06d}', delivery_quantity=str(q),
+                              delivery_date=(today + timedelta(days=int(d))).isoformat(),
+                              creation_date=today.isoformat(), blg_warehouse_stock=int(q) % 7 or None)
+        for a, q, d in zip(rng.integers(0, 2000, rows), rng.integers(0, 800, rows), rng.integers(-30, 120, rows))
+    ], batch_size=1000)
+    pullout = make_pullout(2000, pullout_rows)
+    pullout['con_date'] = pullout['con_date'].dt.strftime('%Y-%m-%d')
+    fetches = []
+    def call_data(model, data):
+        fetches.append(data)
+        return pd.DataFrame(list(model.objects.values())), pullout.copy()
+    snapshot = load_snippet('snapshot', {'call_data': call_data})
+    cache_dir = tempfile.mkdtemp(prefix='call_data_snapshots_')
+    def load():
+        start = time.perf_counter()
+        frames = snapshot['cached_call_data'](bench_db.bmw_supplyon, {"IT_PULLOUT": []}, ttl=600,
+                                              cache_dir=cache_dir)
+        return frames, time.perf_counter() - start
+
+    fresh, cold_time = load()
+    cached, warm_time = load()
+    assert len(fetches) == 1, "second load should come from the snapshot"
+    for fresh_frame, cached_frame in zip(fresh, cached):
+        pd.testing.assert_frame_equal(cached_frame, fresh_frame)
+    bench_db.bmw_supplyon.objects.create(buyer_article_no='ART999999')
+    load()
+    snapshot['invalidate_snapshots'](cache_dir)
+    load()
+    assert len(fetches) == 3, "new rows and invalidation should both refetch"
+    print(f"call_data, {rows} SupplyOn x {pullout_rows} pullout rows: query {cold_time:.2f}s "
+          f"(incl. snapshot write), snapshot {warm_time * 1000:.0f}ms")
+
+def bench_diff_write(rows=20000, changed_share=0.01, seed=9):
+    """Times the writer snippet's write_fields() on a projection: full write, unchanged re-write, and a few changed rows."""
+    import bench_db
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    bench_db.create_tables()
+    bench_db.bmw_supplyon.objects.bulk_create(
+        [bench_db.bmw_supplyon(buyer_article_no=f'ART{i % 2000:06d}') for i in range(rows)], batch_size=1000)
+    writer = load_snippet('writer', {'supplyon_bmw': bench_db.bmw_supplyon, 'transaction': transaction,
+                                     'invalidate_snapshots': lambda: None})
+    rng = np.random.default_rng(seed)
+    today = pd.to_datetime(datetime.today().date())
+    projection = pd.DataFrame({
+        'id': list(bench_db.bmw_supplyon.objects.values_list('pk', flat=True)),
+        'blg_warehouse_stock': pd.Series(rng.integers(-50, 5000, rows)).where(lambda v: v > 0).astype(object),
+        'git_qty': rng.integers(0, 3000, rows),
+        'next_git_wh_qty': rng.integers(0, 3000, rows),
+        'next_git_wh_date': today + pd.to_timedelta(rng.integers(0, 90, rows), unit='D'),
+        'warehouse_stock': rng.integers(0, 9000, rows),
+    })
+    fields = writer['PROJECTION_FIELDS']
+    def write(label, current):
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            written, cells = writer['write_fields'](projection, fields, 500, current)
+        print(f"write-back {label}: {written} rows, {cells} fields, {len(queries)} queries, "
+              f"{time.perf_counter() - start:.2f}s")
+    def loaded():
+        return pd.DataFrame(list(bench_db.bmw_supplyon.objects.values('id', *fields)))
+
+    write("without diff", None)
+    write("unchanged", loaded())
+    current = loaded()
+    touched = rng.choice(rows, int(rows * changed_share), replace=False)
+    projection.loc[touched, 'git_qty'] += 1
+    projection.loc[touched[::2], 'next_git_wh_date'] += pd.Timedelta(days=1)
+    write(f"{changed_share:.0%} changed", current)
+    assert loaded().set_index('id').loc[projection['id'].iloc[touched], 'git_qty'].tolist() == \
+        projection['git_qty'].iloc[touched].tolist()
+
+def bench_chunked_writer(row_counts=(5000, 20000), chunk_size=500):
+    """Streams generated instances through ChunkedUpdater and compares peak memory with collecting them first."""
+    import bench_db
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    bench_db.create_tables()
+    ChunkedUpdater = load_snippet('writer', {'transaction': transaction})['ChunkedUpdater']
+    fields = ['git_qty', 'next_git_wh_qty', 'warehouse_stock']
+    for rows in row_counts:
+        bench_db.reset_tables()
+        bench_db.bmw_supplyon.objects.bulk_create(
+            [bench_db.bmw_supplyon(buyer_article_no=f'ART{i % 2000:06d}') for i in range(rows)], batch_size=1000)
+        pks = list(bench_db.bmw_supplyon.objects.values_list('pk', flat=True))
+        def records(offset):
+            for pk in pks:
+                yield bench_db.bmw_supplyon(pk=pk, git_qty=pk + offset, next_git_wh_qty=offset, warehouse_stock=pk % 97)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with transaction.atomic():
+            bench_db.bmw_supplyon.objects.bulk_update(list(records(1)), fields, batch_size=chunk_size)
+        collected_time = time.perf_counter() - start
+        _, collected_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with CaptureQueriesContext(connection) as queries:
+            with ChunkedUpdater(bench_db.bmw_supplyon, fields, chunk_size, report_every=float('inf')) as writer:
+                for rec in records(2):
+                    writer.add(rec)
+        streamed_time = time.perf_counter() - start
+        _, streamed_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert writer.written == rows and bench_db.bmw_supplyon.objects.filter(next_git_wh_qty=2).count() == rows
+        print(f"{rows} rows: collected {collected_peak / 2 ** 20:.1f} MiB peak, {rows / collected_time:.0f} rows/s; "
+              f"streamed {streamed_peak / 2 ** 20:.1f} MiB peak, {rows / streamed_time:.0f} rows/s, "
+              f"{writer.chunks} chunks, {len(queries)} queries")
+
+def legacy_tag_projection(delivery_data):
+    """Reference: `Tag`'s dict-based projection before array-backed records."""
+    from collections import defaultdict
+    delivery_data.sort(key=lambda x: (x['buyer_article_no'], x['delivery_date']))
+    grouped_data = defaultdict(list)
+    for row in delivery_data:
+        grouped_data[row['buyer_article_no']].append(row)
+    final_result = []
+    for article_no, rows in grouped_data.items():
+        monthly_batches = defaultdict(list)
+        for row in rows:
+            monthly_batches[row['delivery_date'].strftime('%Y-%m')].append(row)
+        month_keys = sorted(monthly_batches.keys())
+        git_batches = []
+        for i in range(len(month_keys)):
+            batch_rows = monthly_batches[month_keys[i]]
+            git_batches.append({'rows': batch_rows, 'git_qty': sum(r['delivery_qty'] for r in batch_rows),
+                                'con_date': batch_rows[0]['delivery_date'], 'batch_tag': f'Nxt Git #{i + 1}'})
+        for i in range(len(git_batches)):
+            curr_batch = git_batches[i]
+            next_batch = git_batches[i + 1] if i + 1 < len(git_batches) else None
+            for row in curr_batch['rows']:
+                row['git_qty'] = curr_batch['git_qty']
+                row['next_git_wh_qty'] = next_batch['git_qty'] if next_batch else 0
+                row['next_git_wh_date'] = next_batch['con_date'] if next_batch else None
+                row['next_git_wh_batch'] = next_batch['batch_tag'] if next_batch else None
+        for i in range(1, len(git_batches)):
+            last_row_prev = git_batches[i - 1]['rows'][-1]
+            git_batches[i]['rows'][0]['blg_warehouse_stock'] = (
+                last_row_prev['blg_warehouse_stock'] + last_row_prev['next_git_wh_qty'])
+        for batch in git_batches:
+            final_result.extend(batch['rows'])
+    return final_result
+
+def make_delivery_rows(rows=400000, articles=20000, seed=13):
+    """`Tag` input: delivery dicts with date objects, as the views build them."""
+    rng = np.random.default_rng(seed)
+    today = datetime.today().date()
+    article_nos = [f'ART{a:06d}' for a in range(articles)]
+    return [{'id': i, 'buyer_article_no': article_nos[a], 'delivery_date': today + timedelta(days=int(d)),
+             'delivery_qty': float(q), 'blg_warehouse_stock': int(s)}
+            for i, (a, d, q, s) in enumerate(zip(rng.integers(0, articles, rows), rng.integers(-20, 200, rows),
+                                                 rng.integers(0, 800, rows), rng.integers(0, 5000, rows)))]
+
+def bench_tag_records(rows=200000, articles=10000):
+    """Golden check, timing and traced peak of `Tag`'s record projection against the dict loop."""
+    tag = load_snippet('Tag')
+    DeliveryRecord = tag['DeliveryRecord']
+
+    def from_records(data):
+        records = [DeliveryRecord(row['id'], row['buyer_article_no'], row['delivery_date'], row['delivery_qty'],
+                                  row['blg_warehouse_stock']) for row in data]
+        return tag['project_records'](records)
+
+    results = {}
+    for name, run in (('legacy dicts', legacy_tag_projection), ('adapter', tag['compute_blg_stock_final']),
+                      ('records', from_records)):
+        data = make_delivery_rows(rows, articles)
+        start = time.perf_counter()
+        results[name] = run(data)
+        elapsed = time.perf_counter() - start
+        data = make_delivery_rows(rows, articles)
+        tracemalloc.start()
+        run(data)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Tag {name}, {rows} deliveries: {elapsed:.2f}s, traced peak over the input {peak / 2 ** 20:.1f} MiB")
+    assert results['adapter'] == results['legacy dicts'], "Adapter differs from the dict projection"
+    assert [{'id': r.id, **{field: getattr(r, field) for field in tag['RESULT_FIELDS']}} for r in results['records']] == \
+        [{'id': r['id'], **{field: r[field] for field in tag['RESULT_FIELDS']}} for r in results['legacy dicts']], \
+        "Record projection differs from the dict projection"
+
+def perturbed_inputs(supplyon, pullout, today, scenario):
+    """The SupplyOn and pullout frames a scenario of `month.project_scenarios` describes."""
+    articles = scenario.get('articles')
+    supplyon, pullout = supplyon.copy(), pullout.copy()
+    rows = supplyon['buyer_article_no'].isin(articles) if articles is not None else slice(None)
+    supplyon.loc[rows, 'delivery_quantity'] *= scenario.get('demand_factor', 1.0)
+    lines = (pullout['RECEP_FLG'] != 'X') & (pullout['con_date'] > today)
+    if articles is not None:
+        lines &= pullout['buyer_article_no'].isin(articles)
+    if scenario.get('delay_scope', 'next') == 'next':
+        lines &= pullout['con_date'] == pullout['con_date'].where(lines).groupby(pullout['buyer_article_no']).transform('min')
+    pullout.loc[lines, 'con_date'] += pd.Timedelta(days=scenario.get('delay_days', 0))
+    return supplyon, pullout
+
+def next_consignment_gaps(pullout, today):
+    """Days from each article's first to its second open con_date; articles with fewer are left out."""
+    open_dates = pullout.loc[(pullout['RECEP_FLG'] != 'X') & (pullout['con_date'] > today), ['buyer_article_no', 'con_date']]
+    open_dates = open_dates.drop_duplicates().sort_values(['buyer_article_no', 'con_date'])
+    position = open_dates.groupby('buyer_article_no').cumcount()
+    first = open_dates[position == 0].set_index('buyer_article_no')['con_date']
+    second = open_dates[position == 1].set_index('buyer_article_no')['con_date']
+    return (second - first.reindex(second.index)).dt.days.to_dict()
+
+def bench_scenarios(articles=2000, months=4, pullout_rows=80000, scenario_count=24):
+    """Golden check and timing of batched what-if scenarios against one projection run per scenario."""
+    today = pd.to_datetime(datetime.today().date())
+    supplyon = make_supplyon(articles, months)
+    pullout = make_pullout(articles, pullout_rows)
+    month = load_snippet('month')
+    article_nos = [f'ART{a:06d}' for a in range(articles)]
+    gaps = next_consignment_gaps(pullout, today)
+    scenarios = [{'name': 'baseline'}]
+    for i in range(1, scenario_count):
+        scenario = {'name': f'scenario {i}', 'delay_days': 7 * (i % 5), 'demand_factor': 1 + 0.1 * (i % 4),
+                    'delay_scope': 'all' if i % 2 else 'next'}
+        if i % 3 == 0:
+            scenario['articles'] = article_nos[::7]
+        scenarios.append(scenario)
+    # Next consignments slipping onto or past the following one, for some and for all articles
+    scenarios.append({'name': 'next overtakes some', 'delay_days': int(np.median(list(gaps.values())))})
+    scenarios.append({'name': 'next overtakes all', 'delay_days': max(gaps.values()) + 1})
+    overtaken = sum(gap <= scenarios[-2]['delay_days'] for gap in gaps.values())
+    assert overtaken, "The overtaking scenarios should move some next consignments past the following one"
+
+    start = time.perf_counter()
+    expected = [month['project_blg_stock'](*perturbed_inputs(supplyon, pullout, today, scenario), today)
+                for scenario in scenarios]
+    rerun_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = month['project_scenarios'](supplyon, pullout, today, scenarios)
+    batched_time = time.perf_counter() - start
+
+    for scenario, projection in zip(scenarios, expected):
+        assert (batched['id'].to_numpy() == projection['id'].to_numpy()).all(), "Scenario rows differ from the projection"
+        assert np.allclose(batched[scenario['name']].to_numpy(), projection['blg_warehouse_stock'].to_numpy()), \
+            f"Scenario {scenario['name']!r} differs from a projection of its perturbed inputs"
+    print(f"{len(scenarios)} what-if scenarios ({overtaken} articles overtaken at the median gap), "
+          f"{len(batched)} deliveries x {pullout_rows} pullout rows: "
+          f"one projection each {rerun_time:.2f}s, batched {batched_time:.2f}s ({rerun_time / batched_time:.1f}x)")
+
+def bench_article_split(articles=5000, rows=200000):
+    today = pd.to_datetime(datetime.today().date())
+    pullout = make_pullout(articles, rows)
+    blg_df = blg_totals_of(pullout)
+    article_nos = [f'ART{a:06d}' for a in range(articles)]
+
+    start = time.perf_counter()
+    masked = masked_lookup(pullout, blg_df, article_nos, today)
+    masked_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    split = split_lookup(pullout, blg_df, article_nos, today)
+    split_time = time.perf_counter() - start
+
+    assert masked == split, "Split lookups differ from masked lookups"
+    print(f"{articles} articles x {rows} pullout rows: masked {masked_time:.2f}s, "
+          f"split {split_time:.2f}s ({masked_time / split_time:.1f}x)")
+
+if __name__ == '__main__':
+    bench_article_split()
+    bench_month_projection()
+    bench_material_positions()
+    bench_stock_projection()
+    bench_lean_inputs()
+    bench_latest_warehouse()
+    bench_snapshot()
+    bench_diff_write()
+    bench_chunked_writer()
+    bench_tag_records()
+    bench_scenarios()